@@ -1,7 +1,14 @@
 import streamlit as st
 import pandas as pd
-from io import StringIO
-import re
+import numpy as np
+from io import StringIO, BytesIO
+import codecs
+from functools import lru_cache
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; the NumPy path below is used without it
+    njit = None
 
 # Configure page
 st.set_page_config(
@@ -11,8 +18,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for Google-like styling
-st.markdown("""
+# Custom CSS for Google-like styling and rich snippet schemas
+@st.cache_resource
+def get_custom_css():
+    return """
 <style>
     .serp-preview {
         background: white;
@@ -94,12 +103,8 @@ st.markdown("""
         margin: 10px 0;
         border-left: 4px solid #4299e1;
     }
-</style>
-""", unsafe_allow_html=True)
-
-# Custom CSS for FAQ Schema
-st.markdown("""
-<style>
+    
+    /* FAQ Schema */
     .faq-item {
         border-top: 1px solid #e5e7eb;
         padding: 12px 0;
@@ -112,12 +117,8 @@ st.markdown("""
     .faq-question::after {
         content: ' ▼'; /* Simple dropdown indicator */
     }
-</style>
-""", unsafe_allow_html=True)
-
-# Custom CSS for Review/Rating Schema
-st.markdown("""
-<style>
+    
+    /* Review/Rating Schema */
     .rating-stars {
         color: #ffc700; /* Google's star color */
         font-size: 16px;
@@ -129,7 +130,40 @@ st.markdown("""
         font-size: 14px;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(get_custom_css(), unsafe_allow_html=True)
+
+# Characters outside latin-1 encode to a byte that carries the default width
+codecs.register_error('serp_default_width', lambda err: ('\x80' * (err.end - err.start), err.end))
+
+# Below this length bytes.translate beats the array-based width sum
+SHORT_TEXT_LENGTH = 128
+
+if njit is not None:
+    @njit
+    def _pixel_width_kernel(buf, lut):
+        """Sum the widths of encoded characters"""
+        total = 0
+        for b in buf:
+            total += lut[b]
+        return total
+
+    @njit
+    def _truncate_index_kernel(buf, lut, max_width, ellipsis_width):
+        """Return the cut index for buf, or -1 if it fits within max_width"""
+        total = 0
+        cut = 0
+        for i in range(buf.size):
+            total += lut[buf[i]]
+            if total <= max_width - ellipsis_width:
+                cut = i + 1
+            elif total > max_width:
+                return cut
+        return -1
+else:
+    _pixel_width_kernel = None
+    _truncate_index_kernel = None
 
 class SERPSimulator:
     def __init__(self):
@@ -148,47 +182,90 @@ class SERPSimulator:
             '"': 5, "'": 3
         }
         
-        # SERP limits (in pixels) - Updated 2024/2025 standards
-        self.limits = {
-            'desktop': {
-                'title': 580,
-                'description': 920
-            },
-            'mobile': {
-                'title': 460,  # Stricter mobile limit for ~50-55 chars
-                'description': 960  # Updated 2024 mobile limit (~155-160 chars)
-            }
-        }
+        # SERP limits (in pixels) as (title, description) - Updated 2024/2025 standards
+        self.desktop_limits = (580, 920)
+        self.mobile_limits = (
+            460,  # Stricter mobile limit for ~50-55 chars
+            960  # Updated 2024 mobile limit (~155-160 chars)
+        )
+
+        # Lookup table indexed by latin-1 byte, in half pixels so 8.5px fits an integer
+        self._lut = np.full(256, 9 * 2, dtype=np.uint16)
+        for char, width in self.char_widths.items():
+            self._lut[ord(char)] = round(width * 2)
+        # Same widths as a bytes.translate table for short strings
+        self._width_table = bytes(self._lut.tolist())
+        # Widest character, so short enough strings can skip measuring entirely
+        self._max_char_width = int(self._lut.max()) / 2
+
+        # Ellipsis is 3 dots; widths never change, so measure it once
+        self._ellipsis_width = self.char_widths['.'] * 3
+
+        # Streamlit reruns and bulk CSVs repeat the same strings, so memoize per instance
+        self.calculate_pixel_width = lru_cache(maxsize=8192)(self.calculate_pixel_width)
+        self.truncate_text = lru_cache(maxsize=8192)(self.truncate_text)
+    
+    def get_limits(self, device):
+        """Return the (title, description) pixel limits for a device"""
+        return self.mobile_limits if device == 'mobile' else self.desktop_limits
+    
+    def _encode(self, text):
+        """Encode text as one byte per character for indexing the width table"""
+        return text.encode('latin-1', 'serp_default_width')
     
     def calculate_pixel_width(self, text):
         """Calculate approximate pixel width of text"""
-        total_width = 0
-        # Use sum() with a generator for a more Pythonic and efficient calculation
-        for char in text:
-            total_width += self.char_widths.get(char, 9)  # Default width for unknown chars
-        return total_width
+        encoded = self._encode(text)
+        if len(encoded) <= SHORT_TEXT_LENGTH:
+            # bytes.translate keeps the loop in C without allocating an array
+            half_pixels = sum(encoded.translate(self._width_table))
+        elif _pixel_width_kernel is not None:
+            half_pixels = int(_pixel_width_kernel(np.frombuffer(encoded, dtype=np.uint8), self._lut))
+        else:
+            half_pixels = int(self._lut[np.frombuffer(encoded, dtype=np.uint8)].sum(dtype=np.int64))
+        # Keep whole-pixel widths as ints for display
+        return half_pixels // 2 if half_pixels % 2 == 0 else half_pixels / 2
     
-    def truncate_text(self, text, max_pixels):
-        """Truncate text based on pixel width limit"""
+    def truncate_text(self, text, max_pixels, precomputed_width=None):
+        """Truncate text based on pixel width limit, reusing its width if already measured"""
         if not text:
             return text, False
 
-        if self.calculate_pixel_width(text) <= max_pixels:
+        if precomputed_width is not None:
+            if precomputed_width <= max_pixels:
+                return text, False
+        elif len(text) * self._max_char_width <= max_pixels:
             return text, False
 
-        # Ellipsis is 3 dots, each 4px wide.
-        ellipsis_width = self.calculate_pixel_width("...")
+        ellipsis_width = self._ellipsis_width
+        buf = np.frombuffer(self._encode(text), dtype=np.uint8)
+        if _truncate_index_kernel is not None:
+            cut = int(_truncate_index_kernel(buf, self._lut, max_pixels * 2, ellipsis_width * 2))
+            if cut < 0:
+                return text, False
+        else:
+            cumulative = np.cumsum(self._lut[buf], dtype=np.int64)
+            if cumulative[-1] <= max_pixels * 2:
+                return text, False
+
+            # Longest prefix that still fits alongside the ellipsis
+            cut = int(np.searchsorted(cumulative, (max_pixels - ellipsis_width) * 2, side='right'))
 
-        # Backtrack from the end of the string to find the right truncation point
-        for i in range(len(text) - 1, 0, -1):
-            truncated = text[:i]
-            if self.calculate_pixel_width(truncated) + ellipsis_width <= max_pixels:
-                return truncated + "...", True
+        if cut > 0:
+            return text[:cut] + "...", True
 
         # If no part of the string fits with an ellipsis, return an ellipsis if it fits
         return ("..." if ellipsis_width <= max_pixels else ""), True
     
-    def format_url(self, url):
+    def analyze_text(self, text, max_pixels):
+        """Measure and truncate text in one go, returning (pixels, truncated_text, was_truncated)"""
+        pixels = self.calculate_pixel_width(text)
+        truncated, was_truncated = self.truncate_text(text, max_pixels, precomputed_width=pixels)
+        return pixels, truncated, was_truncated
+    
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def format_url(url):
         """Format URL for SERP display"""
         """Format URL for SERP display into a breadcrumb-like path."""
         if not url:
@@ -196,17 +273,67 @@ class SERPSimulator:
 
         try:
             # Remove protocol and split into domain and path
-            clean_url = re.sub(r'^https?://', '', url)
-            parts = clean_url.split('/')
-            domain = parts[0].replace('www.', '')
-            path = [p for p in parts[1:] if p]
+            if url.startswith('https://'):
+                clean_url = url[8:]
+            elif url.startswith('http://'):
+                clean_url = url[7:]
+            else:
+                clean_url = url
+            domain, _, rest = clean_url.partition('/')
+            if domain.startswith('www.'):
+                domain = domain[4:]
+            path = [p for p in rest.split('/') if p]
             return f"{domain} › {' › '.join(path)}"
         except Exception:
             return url # Fallback to original URL on error
 
+def to_csv_bytes(df):
+    """Encode a DataFrame as CSV bytes for st.download_button"""
+    buf = BytesIO()
+    df.to_csv(buf, index=False, lineterminator='\n')
+    return buf.getvalue()
+
+@st.cache_resource
+def get_simulator():
+    """Shared SERPSimulator, built once rather than on every rerun"""
+    return SERPSimulator()
+
+@st.cache_data(show_spinner=False)
+def analyze_bulk(file_bytes, title_limit, desc_limit):
+    """Analyze every row of an uploaded CSV against the given pixel limits"""
+    simulator = get_simulator()
+    df = pd.read_csv(BytesIO(file_bytes), usecols=['title', 'description', 'url'], dtype=str, engine='c')
+    
+    # Fill preallocated output columns in one pass instead of building a dict per row
+    n = len(df)
+    title_pixels = np.empty(n, dtype=np.float64)
+    desc_pixels = np.empty(n, dtype=np.float64)
+    title_truncated = np.empty(n, dtype=bool)
+    desc_truncated = np.empty(n, dtype=bool)
+    truncated_titles = [None] * n
+    truncated_descs = [None] * n
+    for i, (title, description) in enumerate(zip(df['title'].fillna(''), df['description'].fillna(''))):
+        title_pixels[i], truncated_titles[i], title_truncated[i] = simulator.analyze_text(title, title_limit)
+        desc_pixels[i], truncated_descs[i], desc_truncated[i] = simulator.analyze_text(description, desc_limit)
+    
+    return pd.DataFrame({
+        'Original_Title': df['title'],
+        'Original_Description': df['description'],
+        'URL': df['url'],
+        # Whole-pixel columns go back to integers, matching calculate_pixel_width
+        'Title_Pixels': pd.to_numeric(title_pixels, downcast='integer'),
+        'Title_OK': title_pixels <= title_limit,
+        'Title_Truncated': title_truncated,
+        'Desc_Pixels': pd.to_numeric(desc_pixels, downcast='integer'),
+        'Desc_OK': desc_pixels <= desc_limit,
+        'Desc_Truncated': desc_truncated,
+        'Truncated_Title': truncated_titles,
+        'Truncated_Description': truncated_descs
+    })
+
 def main():
     # Initialize simulator
-    simulator = SERPSimulator()
+    simulator = get_simulator()
     
     # Header
     st.title("🔍 SERP Snippet Simulator")
@@ -237,7 +364,7 @@ def main():
                 'description': ['Example description 1', 'Example description 2'],
                 'url': ['https://example1.com', 'https://example2.com']
             })
-            csv = template_df.to_csv(index=False)
+            csv = to_csv_bytes(template_df)
             st.download_button(
                 label="Download Template",
                 data=csv,
@@ -283,8 +410,7 @@ def main():
         title_pixels = simulator.calculate_pixel_width(title)
         desc_pixels = simulator.calculate_pixel_width(description)
         
-        title_limit = simulator.limits[device_key]['title']
-        desc_limit = simulator.limits[device_key]['description']
+        title_limit, desc_limit = simulator.get_limits(device_key)
         
         # Display metrics
         st.subheader("📏 Metrics")
@@ -311,41 +437,46 @@ def main():
         st.header("👀 SERP Preview")
         
         # Generate preview
-        truncated_title, title_truncated = simulator.truncate_text(title or "Your Page Title", title_limit)
-        truncated_desc, desc_truncated = simulator.truncate_text(description or "Your meta description appears here...", desc_limit)
+        # Placeholders are measured from scratch; real input reuses the widths from the metrics
+        truncated_title, title_truncated = simulator.truncate_text(
+            title or "Your Page Title", title_limit,
+            precomputed_width=title_pixels if title else None
+        )
+        truncated_desc, desc_truncated = simulator.truncate_text(
+            description or "Your meta description appears here...", desc_limit,
+            precomputed_width=desc_pixels if description else None
+        )
         formatted_url = simulator.format_url(url)
         
         # Preview styling class
         preview_class = "mobile-preview" if device_type == "Mobile" else ""
         
-        # Build the HTML for the preview
-        schema_html = ""
+        # Build the HTML for the preview; rich snippet parts sit above or below the description
+        rating_html = ""
+        faq_html = ""
         if schema_type == "FAQ":
-            schema_html = """
+            faq_html = """
             <div style="padding-top: 0; margin-top: -10px; border-top: 1px solid #e5e7eb;">
                 <div class="faq-item"><div class="faq-question">What is the first sample question?</div></div>
                 <div class="faq-item"><div class="faq-question">What is the second sample question?</div></div>
                 <div class="faq-item"><div class="faq-question">What is the third sample question?</div></div>
-            </div>
-            """
+            </div>"""
         elif schema_type == "Review/Rating":
             # Prepend rating before the description
-            schema_html = """
+            rating_html = """
             <div>
                 <span class="rating-stars">★★★★☆</span>
                 <span class="rating-text">Rating: 4.5 - 1,234 reviews</span>
-            </div>
-            """
+            </div>"""
+        title_class = 'truncated-text' if title_truncated else ''
+        desc_class = 'truncated-text' if desc_truncated else ''
 
         # Display preview
         st.markdown(f"""
-        <div class="serp-preview {preview_class}">"""
-        + f"""<div class="serp-title {'truncated-text' if title_truncated else ''}">{truncated_title}</div>
-            <div class="serp-url">{formatted_url}</div>"""
-        + (schema_html if schema_type == 'Review/Rating' else '')
-        + f"""<div class="serp-description {'truncated-text' if desc_truncated else ''}">{truncated_desc}</div>"""
-        + (schema_html if schema_type == 'FAQ' else '')
-        + """
+        <div class="serp-preview {preview_class}">
+            <div class="serp-title {title_class}">{truncated_title}</div>
+            <div class="serp-url">{formatted_url}</div>{rating_html}
+            <div class="serp-description {desc_class}">{truncated_desc}</div>{faq_html}
         </div>
         """, unsafe_allow_html=True)
         
@@ -374,7 +505,7 @@ def main():
         
         # Download CSV
         export_df = pd.DataFrame([export_data])
-        csv_export = export_df.to_csv(index=False)
+        csv_export = to_csv_bytes(export_df)
         st.download_button(
             label="📊 Download as CSV",
             data=csv_export,
@@ -387,39 +518,15 @@ def main():
         st.header("📊 Bulk Analysis Results")
         
         try:
-            # Read uploaded CSV
-            df = pd.read_csv(uploaded_file)
-            
-            if not all(col in df.columns for col in ['title', 'description', 'url']):
-                st.error("CSV must contain columns: title, description, url")
+            # Check the header before handing the file to the cached analysis
+            header = pd.read_csv(uploaded_file, nrows=0)
+            missing = {'title', 'description', 'url'}.difference(header.columns)
+            if missing:
+                st.error(f"CSV must contain columns: title, description, url (missing: {', '.join(sorted(missing))})")
                 return
             
-            # Process each row
-            results = []
-            for _, row in df.iterrows():
-                title = str(row.get('title', ''))
-                description = str(row.get('description', ''))
-                title_pixels = simulator.calculate_pixel_width(title)
-                desc_pixels = simulator.calculate_pixel_width(description)
-                
-                truncated_title, title_truncated = simulator.truncate_text(title, title_limit)
-                truncated_desc, desc_truncated = simulator.truncate_text(description, desc_limit)
-                
-                results.append({
-                    'Original_Title': row['title'],
-                    'Original_Description': row['description'],
-                    'URL': row['url'],
-                    'Title_Pixels': title_pixels,
-                    'Title_OK': title_pixels <= title_limit,
-                    'Title_Truncated': title_truncated,
-                    'Desc_Pixels': desc_pixels,
-                    'Desc_OK': desc_pixels <= desc_limit,
-                    'Desc_Truncated': desc_truncated,
-                    'Truncated_Title': truncated_title,
-                    'Truncated_Description': truncated_desc
-                })
-            
-            results_df = pd.DataFrame(results)
+            # Re-analyze only when the file contents or limits change
+            results_df = analyze_bulk(uploaded_file.getvalue(), title_limit, desc_limit)
             
             # Display summary metrics
             col1, col2, col3, col4 = st.columns(4)
@@ -448,7 +555,7 @@ def main():
             )
             
             # Download bulk results
-            bulk_csv = results_df.to_csv(index=False)
+            bulk_csv = to_csv_bytes(results_df)
             st.download_button(
                 label="📊 Download Bulk Results",
                 data=bulk_csv,